@@ -1,5 +1,6 @@
+from html import escape
+
 import streamlit as st
-import pandas as pd
 
 # Sample data for Psalm 23 with Hebrew lemmas and glosses
 psalm_23_data = [
@@ -41,6 +42,16 @@ psalm_23_data = [
     }
 ]
 
+# Parsed psalm data keyed by psalm number
+psalms = {23: psalm_23_data}
+
+# Background color and emoji for each pair type
+pair_styles = {
+    "Outer Mirror": ("#FFE4E1", "🔴"),  # Coral/peach
+    "Quartile Echo": ("#FFF8DC", "🟡"),  # Gold
+    "Center Hinge": ("#E6E6FA", "🟣"),  # Lavender
+}
+
 # Compute verse pairings
 def compute_pairings(psalm_data):
     n = len(psalm_data)
@@ -51,16 +62,15 @@ def compute_pairings(psalm_data):
         v1 = psalm_data[i]
         v2 = psalm_data[n - 1 - i]
         
-        # Extract lemma IDs for comparison
-        lemmas_1 = {lem[0] for lem in v1["lemmas"]}
-        lemmas_2 = {lem[0] for lem in v2["lemmas"]}
-        shared = lemmas_1 & lemmas_2
-        
-        # Get shared lemma details
-        shared_details = []
-        for lem in v1["lemmas"]:
-            if lem[0] in shared:
-                shared_details.append(lem)
+        if v1["lemmas"] and v2["lemmas"]:
+            # Extract lemma IDs of the mirrored verse for comparison
+            lemmas_2 = {lem[0] for lem in v2["lemmas"]}
+
+            # Get shared lemma details in a single pass over the first verse
+            shared_details = [lem for lem in v1["lemmas"] if lem[0] in lemmas_2]
+        else:
+            # Nothing can be shared with a verse that has no lemmas (e.g. a superscription)
+            shared_details = []
         
         pairs.append({
             "type": pair_type,
@@ -81,17 +91,58 @@ def compute_pairings(psalm_data):
     
     return pairs
 
+# Pairings depend only on the psalm, so compute them once per psalm rather than on every rerun (bounded to the 150 psalms)
+@st.cache_data(max_entries=150)
+def get_pairings(psalm_number):
+    return compute_pairings(psalms[psalm_number])
+
+# Build the HTML for a single verse: label, Hebrew, English
+def render_verse_html(verse, label):
+    return (
+        f"<p><strong>{label}</strong></p>"
+        f"<p><em>{escape(verse['hebrew'])}</em></p>"
+        f"<p>{escape(verse['english'])}</p>"
+    )
+
+# Build the whole card for a pair as one HTML string, so it is sent to the browser as a single element
+def render_pair_html(pair, show_lemmas):
+    bg_color, emoji = pair_styles[pair["type"]]
+    
+    v1 = pair["verse_1"]
+    v2 = pair["verse_2"]
+    if v2 is not None:
+        # Two-column layout for pairs
+        col1 = render_verse_html(v1, f"Verse {v1['verse']}")
+        col2 = render_verse_html(v2, f"Verse {v2['verse']}")
+        body = (
+            "<div style='display: flex; gap: 1rem;'>"
+            f"<div style='flex: 1;'>{col1}</div>"
+            f"<div style='flex: 1;'>{col2}</div>"
+            "</div>"
+        )
+        if show_lemmas and pair["shared_lemmas"]:
+            body += f"<p>🏷️ <strong>Shared lemmas ({len(pair['shared_lemmas'])})</strong></p>"
+    else:
+        # Center verse (single column)
+        body = (
+            render_verse_html(v1, f"⭐ Verse {v1['verse']} — Theological Hinge ⭐")
+            + "<p>ℹ️ <em>This central verse often contains the main theological point of the entire Psalm.</em></p>"
+        )
+    
+    return (
+        f"<div style='background-color: {bg_color}; padding: 1.5rem; border-radius: 10px; margin-bottom: 1.5rem;'>"
+        f"<h3>{emoji} {pair['type']}</h3>"
+        f"{body}"
+        "</div>"
+    )
+
 # Streamlit UI
 st.set_page_config(page_title="Psalm Chiasm Explorer", layout="wide")
 st.title("📖 Psalm Chiasm Explorer")
 st.markdown("*Exploring chiastic structures in Biblical Psalms with Hebrew lemma analysis*")
 
-# Sidebar controls
+# Sidebar
 with st.sidebar:
-    st.header("Settings")
-    min_lemmas = st.slider("Minimum shared lemmas to display", 0, 5, 0)
-    show_lemmas = st.checkbox("Show lemma details", value=True)
-    st.markdown("---")
     st.markdown("### About Chiasm")
     st.markdown("""
     A **chiasm** (or chiastic structure) is a literary pattern where concepts 
@@ -105,58 +156,31 @@ st.subheader("Psalm 23")
 st.caption("Demonstration using actual OSHB Hebrew lemma data")
 
 # Compute pairings
-pairs = compute_pairings(psalm_23_data)
+pairs = get_pairings(23)
 
-# Display pairs
-for pair in pairs:
-    if len(pair["shared_lemmas"]) < min_lemmas and pair["type"] != "Center Hinge":
-        continue
+# Display pairs; the display controls live inside the fragment so changing them reruns only this section
+@st.fragment
+def render_pairs(pairs):
+    col1, col2 = st.columns(2)
+    with col1:
+        min_lemmas = st.slider("Minimum shared lemmas to display", 0, 5, 0)
+    with col2:
+        show_lemmas = st.checkbox("Show lemma details", value=True)
     
-    # Choose color based on type
-    if pair["type"] == "Outer Mirror":
-        bg_color = "#FFE4E1"  # Coral/peach
-        emoji = "🔴"
-    elif pair["type"] == "Quartile Echo":
-        bg_color = "#FFF8DC"  # Gold
-        emoji = "🟡"
-    else:  # Center Hinge
-        bg_color = "#E6E6FA"  # Lavender
-        emoji = "🟣"
+    for pair in pairs:
+        if len(pair["shared_lemmas"]) < min_lemmas and pair["type"] != "Center Hinge":
+            continue
     
-    with st.container():
-        st.markdown(f"<div style='background-color: {bg_color}; padding: 1.5rem; border-radius: 10px; margin-bottom: 1.5rem;'>", unsafe_allow_html=True)
-        st.markdown(f"### {emoji} {pair['type']}")
+        with st.container():
+            st.markdown(render_pair_html(pair, show_lemmas), unsafe_allow_html=True)
         
-        if pair["verse_2"] is not None:
-            # Two-column layout for pairs
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown(f"**Verse {pair['verse_1']['verse']}**")
-                st.markdown(f"*{pair['verse_1']['hebrew']}*")
-                st.markdown(pair['verse_1']['english'])
-            
-            with col2:
-                st.markdown(f"**Verse {pair['verse_2']['verse']}**")
-                st.markdown(f"*{pair['verse_2']['hebrew']}*")
-                st.markdown(pair['verse_2']['english'])
-            
-            # Show shared lemmas
+            # The lemma table stays an interactive expander outside the HTML card
             if show_lemmas and pair["shared_lemmas"]:
-                st.markdown(f"\n🏷️ **Shared lemmas ({len(pair['shared_lemmas'])})**")
-                
                 with st.expander("View lemma details"):
-                    lemma_df = pd.DataFrame(pair["shared_lemmas"], columns=["Strong's", "Hebrew", "Gloss"])
-                    st.table(lemma_df)
-        
-        else:
-            # Center verse (single column)
-            st.markdown(f"**⭐ Verse {pair['verse_1']['verse']} — Theological Hinge ⭐**")
-            st.markdown(f"*{pair['verse_1']['hebrew']}*")
-            st.markdown(pair['verse_1']['english'])
-            st.info("This central verse often contains the main theological point of the entire Psalm.")
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+                    rows = "\n".join(f"| {strongs} | {hebrew} | {gloss} |" for strongs, hebrew, gloss in pair["shared_lemmas"])
+                    st.markdown(f"| Strong's | Hebrew | Gloss |\n|---|---|---|\n{rows}")
+
+render_pairs(pairs)
 
 st.markdown("---")
 st.markdown("### Next Steps")